@@ -1,7 +1,19 @@
-class ExpectedKeysError(Exception):
+class MessageKeyError(KeyError):
+    """KeyError, который выводит сообщение без кавычек."""
+
+    def __str__(self):
+        """Текст ошибки как есть."""
+        return str(self.args[0]) if self.args else ''
+
+
+class ExpectedKeysError(MessageKeyError):
     """Ошибка ключей в ответе."""
 
 
+class UnknownStatusError(MessageKeyError):
+    """Недокументированный статус домашней работы."""
+
+
 class EmptyValueError(Exception):
     """Ошибка пустое значение"""
 
@@ -10,5 +22,13 @@ class TheAnswerStatusCodeNot200Error(Exception):
     """Ответ API не равен 200."""
 
 
+class TheAnswerTooLargeError(Exception):
+    """Ответ API превышает допустимый размер."""
+
+
 class TheAnswerListError(Exception):
     """Ответ API имеет неверный тип данных."""
+
+
+class TheAnswerDictOrListError(TypeError):
+    """Ответ API не является словарём."""
@@ -1,58 +1,201 @@
+import atexit
+import hashlib
 import logging
 import os
+import random
+import signal
+import threading
 import time
-from json import JSONDecodeError
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from types import MappingProxyType
 
+import orjson
 import requests
 import telegram
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from telegram.utils.request import Request
+from urllib3.util.retry import Retry
 
 from exceptions import (
-    EmptyValueError,
     ExpectedKeysError,
+    TheAnswerDictOrListError,
     TheAnswerListError,
     TheAnswerStatusCodeNot200Error,
+    TheAnswerTooLargeError,
+    UnknownStatusError,
 )
 
-load_dotenv(override=True)
+Config = namedtuple('Config', 'practicum telegram chat_id')
 
 
-PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
-TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
-TELEGRAM_CHAT_ID = os.getenv('CHAT_ID')
+@lru_cache(maxsize=1)
+def _load_config():
+    """Однократное чтение переменных окружения."""
+    load_dotenv(override=True)
+    return Config(
+        os.getenv('PRACTICUM_TOKEN'),
+        os.getenv('TELEGRAM_TOKEN'),
+        os.getenv('CHAT_ID'),
+    )
+
+
+@lru_cache(maxsize=1)
+def _auth_headers(practicum_token):
+    """Заголовки авторизации API, собранные один раз для токена."""
+    return MappingProxyType(
+        {'Authorization': 'OAuth ' + (practicum_token or '')}
+    )
+
+
+PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID = _load_config()
 
 
 RETRY_TIME = 600
+BASE_DELAY = 1.0
+POLL_BASE_DELAY = 30
+STATE_FILE = 'state.json'
+MAX_RESPONSE_SIZE = 1_000_000
+READ_CHUNK_SIZE = 64 * 1024
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
-HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
+API_TIMEOUT = (5, 30)
 
+API_RETRIES = Retry(
+    total=3,
+    backoff_factor=1.0,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=['GET'],
+    raise_on_status=False,
+)
 
-HOMEWORK_STATUSES = {
+_SESSION = requests.Session()
+_SESSION.mount(
+    'https://',
+    HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=API_RETRIES),
+)
+
+
+HOMEWORK_STATUSES = MappingProxyType({
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
     'reviewing': 'Работа взята на проверку ревьюером.',
     'rejected': 'Работа проверена: у ревьюера есть замечания.',
-}
-
-logging.basicConfig(
-    level=logging.DEBUG,
-    filename='program.log',
-    format=(
-        '%(asctime)s - %(name)s - %(levelname)s - '
-        '%(funcName)s: %(lineno)s - %(message)s'
-    ),
+})
+_STATUS_MESSAGES = MappingProxyType({
+    status: 'Изменился статус проверки работы "{}".\n' + verdict
+    for status, verdict in HOMEWORK_STATUSES.items()
+})
+
+_RESPONSE_SPEC = (('homeworks', list, True), ('current_date', int, False))
+_HOMEWORK_SPEC = (('homework_name', str, True), ('status', str, True))
+
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+LOG_FORMAT = (
+    '%(asctime)s - %(name)s - %(levelname)s - '
+    '%(funcName)s: %(lineno)s - %(message)s'
 )
+DEBUG_LOG_FORMAT = '%(asctime)s %(levelname)s %(message)s'
+
+
+class LevelFormatter(logging.Formatter):
+    """Краткий формат для DEBUG, подробный для INFO и выше."""
+
+    def __init__(self):
+        """Подготовка подробного и краткого форматов."""
+        super().__init__(LOG_FORMAT)
+        self.debug_formatter = logging.Formatter(DEBUG_LOG_FORMAT)
+
+    def format(self, record):
+        """Выбор формата по уровню записи."""
+        if record.levelno <= logging.DEBUG:
+            return self.debug_formatter.format(record)
+        return super().format(record)
+
+
 logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+logger.propagate = False
+file_handler = logging.FileHandler('program.log')
+file_handler.setFormatter(LevelFormatter())
+logger.addHandler(file_handler)
 handler = logging.StreamHandler()
 logger.addHandler(handler)
 
+_STOP = threading.Event()
 
-def send_message(bot, message):
-    """Отправка сообщения в Telegram чат."""
+MAX_PENDING_MESSAGES = 10
+DEDUP_TTL = RETRY_TIME
+_last_sent = {}
+_LAST_SENT_LOCK = threading.Lock()
+_TG_EXEC = ThreadPoolExecutor(max_workers=1)
+_TG_PENDING = threading.BoundedSemaphore(MAX_PENDING_MESSAGES)
+atexit.register(_TG_EXEC.shutdown, wait=True)
+
+
+def _do_send(bot, message, message_hash):
+    """Синхронная отправка сообщения, выполняется в фоновом потоке."""
     try:
         bot.send_message(chat_id=TELEGRAM_CHAT_ID, text=message)
-        logger.info(f'Сообщение в Telegram отправлено: {message}')
+        logger.info('Сообщение в Telegram отправлено: %s', message)
     except telegram.error.TelegramError as telegram_error:
-        logger.error(f'Сообщение в Telegram не отправлено: {telegram_error}')
+        with _LAST_SENT_LOCK:
+            _last_sent.pop(message_hash, None)
+        logger.error('Сообщение в Telegram не отправлено: %s', telegram_error)
+    finally:
+        _TG_PENDING.release()
+
+
+def send_message(bot, message):
+    """Отправка сообщения в Telegram чат."""
+    now = time.monotonic()
+    message_hash = hashlib.blake2b(
+        message.encode(), digest_size=8
+    ).hexdigest()
+    with _LAST_SENT_LOCK:
+        for expired in [
+            key for key, sent in _last_sent.items()
+            if now - sent >= DEDUP_TTL
+        ]:
+            del _last_sent[expired]
+        if message_hash in _last_sent:
+            logger.debug('Повторное сообщение не отправлено: %s', message)
+            return None
+        if not _TG_PENDING.acquire(blocking=False):
+            logger.error(
+                'Очередь отправки переполнена, пропущено: %s', message
+            )
+            return None
+        _last_sent[message_hash] = now
+    return _TG_EXEC.submit(_do_send, bot, message, message_hash)
+
+
+def _check_answer_size(size):
+    """Проверка размера ответа API до разбора JSON."""
+    if size >= MAX_RESPONSE_SIZE:
+        size_error_msg = f'Ответ API слишком большой: {size} байт'
+        logger.error(size_error_msg)
+        raise TheAnswerTooLargeError(size_error_msg)
+
+
+def _read_answer(response, timestamp):
+    """Чтение и разбор тела успешного ответа API."""
+    content_length = response.headers.get('Content-Length')
+    if content_length == '0':
+        return {'homeworks': [], 'current_date': timestamp}
+    if content_length is not None and content_length.isdigit():
+        _check_answer_size(int(content_length))
+    content = bytearray()
+    for chunk in response.iter_content(chunk_size=READ_CHUNK_SIZE):
+        content += chunk
+        _check_answer_size(len(content))
+    answer = orjson.loads(memoryview(content))
+    if not isinstance(answer, dict):
+        return answer[0]
+    return answer
 
 
 def get_api_answer(current_timestamp):
@@ -60,130 +203,229 @@ def get_api_answer(current_timestamp):
     timestamp = current_timestamp or int(time.time())
     params = {'from_date': timestamp}
     try:
-        response = requests.get(ENDPOINT, headers=HEADERS, params=params)
-        if response.status_code != 200:
-            api_error_msg = (
-                f'Эндпоинт {ENDPOINT} недоступен. '
-                f'Код ответа API: {response.status_code}'
-            )
-            logger.error(api_error_msg)
-            raise TheAnswerStatusCodeNot200Error(api_error_msg)
-        if not isinstance(response.json(), dict):
-            return response.json()[0]
-        return response.json()
+        response = _SESSION.get(
+            ENDPOINT,
+            headers=_auth_headers(PRACTICUM_TOKEN),
+            params=params,
+            timeout=API_TIMEOUT,
+            stream=True,
+        )
+        try:
+            if response.status_code != 200:
+                api_error_msg = (
+                    f'Эндпоинт {ENDPOINT} недоступен. '
+                    f'Код ответа API: {response.status_code}'
+                )
+                logger.error(api_error_msg)
+                raise TheAnswerStatusCodeNot200Error(api_error_msg)
+            return _read_answer(response, timestamp)
+        finally:
+            response.close()
+    except orjson.JSONDecodeError as json_error:
+        decode_error = orjson.JSONDecodeError(
+            f'Ошибка полученных данных: {json_error.msg}',
+            json_error.doc,
+            json_error.pos,
+        )
+        logger.error(decode_error)
+        raise decode_error from json_error
     except requests.exceptions.RequestException as request_error:
-        logger.error(f'Код ответа API: {request_error}')
-        raise SystemExit(request_error)
-    except JSONDecodeError as json_error:
-        json_error_msf = f'Ошибка полученных данных: {json_error}'
-        logger.error(json_error_msf)
-        raise JSONDecodeError(json_error_msf)
+        logger.error('Код ответа API: %s', request_error)
+        raise
 
 
-def check_response(response):
-    """Проверка ответа API на корректность."""
-    try:
-        answer = response.get('homeworks')
-    except AttributeError:
-        logger.error('Ошибка доступа к атрибуту')
-        raise AttributeError('Ошибка доступа к атрибуту')
-    else:
-        if answer is None:
-            api_error_msg = (
-                'Отсутсвует ожидаемый ключ "homeworks" в ответе API'
-            )
+def _check_spec(data, spec):
+    """Проверка наличия и типа ключей по таблице спецификации."""
+    if not isinstance(data, dict):
+        dict_error_msg = 'Ответ API не является словарём'
+        logger.error(dict_error_msg)
+        raise TheAnswerDictOrListError(dict_error_msg)
+    for key, value_type, required in spec:
+        if key not in data:
+            if not required:
+                continue
+            api_error_msg = f'Отсутсвует ожидаемый ключ "{key}" в ответе API'
             logger.error(api_error_msg)
             raise ExpectedKeysError(api_error_msg)
-        if len(answer) == 0:
-            return {}
-        if not isinstance(answer, list):
-            list_error_msg = 'Ответ API имеет неправильное значение'
+        if not isinstance(data[key], value_type):
+            list_error_msg = f'Ответ API имеет неправильное значение {key}'
             logger.error(list_error_msg)
             raise TheAnswerListError(list_error_msg)
-        return answer
+
+
+def check_response(response):
+    """Проверка ответа API на корректность."""
+    _check_spec(response, _RESPONSE_SPEC)
+    return response['homeworks']
 
 
 def parse_status(homework):
     """Информация о статусе домашней работы."""
-    try:
-        homework_name = homework.get('homework_name')
-        homework_status = homework.get('status')
-    except AttributeError:
-        logger.error('Ошибка доступа к атрибуту')
-        raise AttributeError('Ошибка доступа к атрибуту')
-    else:
-        if homework_name is None:
-            name_error_msg = 'Отсутсвует значение homework_name'
-            logger.error(name_error_msg)
-        if homework_status is None:
-            status_error_msg = 'Отсутсвует значение status'
-            logger.error(status_error_msg)
-            raise EmptyValueError(status_error_msg)
-        if homework_status not in HOMEWORK_STATUSES:
-            api_error_msg = f'Недокументированный статус: {homework_status}'
-            logger.error(api_error_msg)
-
-    verdict = HOMEWORK_STATUSES[homework_status]
-    return f'Изменился статус проверки работы "{homework_name}".\n{verdict}'
+    _check_spec(homework, _HOMEWORK_SPEC)
+    homework_status = homework['status']
+    status_message = _STATUS_MESSAGES.get(homework_status)
+    if status_message is None:
+        api_error_msg = f'Недокументированный статус: {homework_status}'
+        logger.error(api_error_msg)
+        raise UnknownStatusError(api_error_msg)
+    return status_message.format(homework['homework_name'])
 
 
 def check_tokens():
     """Проверка доступности переменных окружения."""
-    ENV_VARS = {
-        'PRACTICUM_TOKEN': PRACTICUM_TOKEN,
-        'TELEGRAM_TOKEN': TELEGRAM_TOKEN,
-        'TELEGRAM_CHAT_ID': TELEGRAM_CHAT_ID,
-    }
-    tokens_status = True
-    for token_name, token_value in ENV_VARS.items():
-        if token_value is None:
-            tokens_status = False
-            logger.critical(
-                f'Отсутствует обязательная переменная окружения: {token_name}.'
-                '\nПрограмма принудительно остановлена.'
-            )
-    return tokens_status
+    missing = [
+        token_name
+        for token_name, token_value in (
+            ('PRACTICUM_TOKEN', PRACTICUM_TOKEN),
+            ('TELEGRAM_TOKEN', TELEGRAM_TOKEN),
+            ('TELEGRAM_CHAT_ID', TELEGRAM_CHAT_ID),
+        )
+        if not token_value
+    ]
+    if missing:
+        logger.critical(
+            'Отсутствуют обязательные переменные окружения: %s.'
+            '\nПрограмма принудительно остановлена.',
+            ', '.join(missing),
+        )
+    return not missing
+
+
+def load_state():
+    """Чтение сохранённых метки времени и статуса работы."""
+    try:
+        with open(STATE_FILE, 'rb') as state_file:
+            state = orjson.loads(state_file.read())
+    except FileNotFoundError:
+        return {}
+    except (OSError, orjson.JSONDecodeError) as state_error:
+        logger.error('Не удалось прочитать %s: %s', STATE_FILE, state_error)
+        return {}
+    if not isinstance(state, dict):
+        logger.error('Неверный формат %s: %s', STATE_FILE, state)
+        return {}
+    valid_state = {}
+    timestamp = state.get('ts')
+    if isinstance(timestamp, int) and not isinstance(timestamp, bool):
+        valid_state['ts'] = timestamp
+    if state.get('status') in HOMEWORK_STATUSES:
+        valid_state['status'] = state['status']
+    if len(valid_state) != len(state):
+        logger.error('Неверные значения в %s: %s', STATE_FILE, state)
+    return valid_state
+
+
+def save_state(current_timestamp, current_status):
+    """Атомарная запись метки времени и статуса работы на диск."""
+    tmp_file = f'{STATE_FILE}.tmp'
+    state = {'ts': current_timestamp, 'status': current_status}
+    try:
+        with open(tmp_file, 'wb') as state_file:
+            state_file.write(orjson.dumps(state))
+        os.replace(tmp_file, STATE_FILE)
+    except OSError as state_error:
+        logger.error('Не удалось сохранить %s: %s', STATE_FILE, state_error)
+
+
+def get_retry_delay(fail_count):
+    """Задержка перед повторным запросом после серии сбоев."""
+    delay = min(RETRY_TIME, BASE_DELAY * 2 ** fail_count)
+    return delay * (1 + random.uniform(0, 0.5))
+
+
+def get_poll_delay(polls_since_change):
+    """Интервал опроса API: чаще сразу после смены статуса, реже потом."""
+    return min(RETRY_TIME, POLL_BASE_DELAY * 2 ** polls_since_change)
+
+
+def stop_polling(signum, frame):
+    """Прерывание ожидания следующего запроса по сигналу."""
+    logger.info('Получен сигнал %s. Бот останавливается.', signum)
+    _STOP.set()
+
+
+def notify_status_changes(bot, homeworks, current_status):
+    """Отправка сообщений о смене статуса.
+
+    Возвращает последний статус и признак того, что он менялся.
+    """
+    changed = False
+    for homework in homeworks:
+        if homework and current_status != homework['status']:
+            send_message(bot, parse_status(homework))
+            current_status = homework['status']
+            changed = True
+    return current_status, changed
+
+
+def confirm_stop():
+    """Запрос подтверждения остановки бота."""
+    stop_bot = input('Вы действительно хотите остановить работу бота? Y/N: ')
+    if stop_bot in ('Y', 'y'):
+        print('До встречи!')
+        return True
+    if stop_bot in ('N', 'n'):
+        print('Продолжаем работать!')
+    return False
 
 
 def main():
     """Основная логика работы бота."""
     if not check_tokens():
         exit()
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    current_timestamp = int(time.time())
-    current_status = 'reviewing'
-    errors = True
-    while True:
+    bot = telegram.Bot(
+        token=TELEGRAM_TOKEN,
+        request=Request(
+            connect_timeout=API_TIMEOUT[0], read_timeout=API_TIMEOUT[1]
+        ),
+    )
+    state = load_state()
+    current_timestamp = state.get('ts', int(time.time()) - RETRY_TIME)
+    current_status = state.get('status', 'reviewing')
+    fail_count = 0
+    polls_since_change = 0
+    signal.signal(signal.SIGTERM, stop_polling)
+    while not _STOP.is_set():
         try:
             response = get_api_answer(current_timestamp)
             homeworks = check_response(response)
-            for homework in homeworks:
-                if homework and current_status != homework['status']:
-                    message = parse_status(homework)
-                    send_message(bot, message)
-                    current_status = homework['status']
-                    current_timestamp = response['current_date']
-                    time.sleep(RETRY_TIME)
-            logger.debug('Пока изменений нет. Новый запрос через 10 минут.')
-            current_timestamp = response['current_date']
-            time.sleep(RETRY_TIME)
-        except KeyboardInterrupt:
-            stop_bot = input(
-                'Вы действительно хотите остановить работу бота? Y/N: '
+            current_status, changed = notify_status_changes(
+                bot, homeworks, current_status
             )
-            if stop_bot in ('Y', 'y'):
-                print('До встречи!')
+            if changed:
+                polls_since_change = 0
+            current_timestamp = response.get(
+                'current_date', current_timestamp
+            )
+            save_state(current_timestamp, current_status)
+            delay = get_poll_delay(polls_since_change)
+            polls_since_change += 1
+            logger.debug('Новый запрос через %s секунд.', delay)
+            _STOP.wait(delay)
+        except KeyboardInterrupt:
+            if confirm_stop():
                 break
-            elif stop_bot in ('N', 'n'):
-                print('Продолжаем работать!')
+        except orjson.JSONDecodeError as error:
+            message = f'Сбой в работе программы: {error}'
+            send_message(bot, message)
+            logger.critical(message)
+            break
+        except (
+            TheAnswerStatusCodeNot200Error,
+            requests.exceptions.RequestException,
+        ) as error:
+            message = f'Сбой в работе программы: {error}'
+            send_message(bot, message)
+            logger.critical(message)
+            fail_count += 1
+            _STOP.wait(get_retry_delay(fail_count))
         except Exception as error:
             message = f'Сбой в работе программы: {error}'
-            if errors:
-                errors = False
-                send_message(bot, message)
+            send_message(bot, message)
             logger.critical(message)
-            time.sleep(RETRY_TIME)
+            _STOP.wait(RETRY_TIME)
         else:
+            fail_count = 0
             logger.debug('Программа работает без ошибок!')
 
 
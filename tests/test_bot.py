@@ -1,7 +1,7 @@
+import json
 import os
 from http import HTTPStatus
 
-import requests
 import telegram
 import utils
 
@@ -44,6 +44,7 @@ class MockResponseGET:
         )
         self.random_timestamp = random_timestamp
         self.status_code = http_status
+        self.headers = {}
 
     def json(self):
         data = {
@@ -52,6 +53,27 @@ class MockResponseGET:
         }
         return data
 
+    @property
+    def content(self):
+        return json.dumps(self.json()).encode()
+
+    def iter_content(self, chunk_size=1):
+        content = self.content
+        self.chunks_read = 0
+        for start in range(0, len(content), chunk_size):
+            self.chunks_read += 1
+            yield content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+class MockInvalidJSONResponseGET(MockResponseGET):
+
+    @property
+    def content(self):
+        return b'not json'
+
 
 class MockTelegramBot:
 
@@ -73,6 +95,12 @@ class MockTelegramBot:
         return self.random_timestamp
 
 
+class MockFailingTelegramBot(MockTelegramBot):
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        raise telegram.error.TelegramError('Telegram недоступен')
+
+
 class TestHomework:
     HOMEWORK_STATUSES = {
         'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
@@ -186,7 +214,7 @@ class TestHomework:
                 current_timestamp=current_timestamp, **kwargs
             )
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        utils.patch_session_get(monkeypatch, mock_response_get)
 
         import homework
 
@@ -232,7 +260,7 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_500_response_get)
+        utils.patch_session_get(monkeypatch, mock_500_response_get)
 
         import homework
 
@@ -315,7 +343,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        utils.patch_session_get(monkeypatch, mock_response_get)
 
         import homework
 
@@ -352,7 +380,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        utils.patch_session_get(monkeypatch, mock_response_get)
 
         import homework
 
@@ -400,7 +428,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        utils.patch_session_get(monkeypatch, mock_response_get)
 
         import homework
 
@@ -448,7 +476,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        utils.patch_session_get(monkeypatch, mock_response_get)
 
         import homework
 
@@ -484,7 +512,7 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_no_homeworks_response_get)
+        utils.patch_session_get(monkeypatch, mock_no_homeworks_response_get)
 
         import homework
 
@@ -525,7 +553,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        utils.patch_session_get(monkeypatch, mock_response_get)
 
         import homework
 
@@ -565,7 +593,7 @@ class TestHomework:
             response.json = valid_response_json
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        utils.patch_session_get(monkeypatch, mock_response_get)
 
         import homework
 
@@ -599,7 +627,7 @@ class TestHomework:
             response.json = json_invalid
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_empty_response_get)
+        utils.patch_session_get(monkeypatch, mock_empty_response_get)
 
         import homework
 
@@ -626,7 +654,7 @@ class TestHomework:
             )
             return response
 
-        monkeypatch.setattr(requests, 'get', mock_response_get)
+        utils.patch_session_get(monkeypatch, mock_response_get)
 
         import homework
 
@@ -640,3 +668,378 @@ class TestHomework:
                 f'Убедитесь, что в функции `{func_name}` обрабатываете ситуацию, '
                 'когда API возвращает код, отличный от 200'
             )
+
+    def test_get_api_answer_uses_current_token(self, monkeypatch,
+                                               random_timestamp,
+                                               current_timestamp, api_url):
+        sent_headers = []
+
+        def mock_response_get(*args, **kwargs):
+            sent_headers.append(kwargs.get('headers'))
+            return MockResponseGET(
+                *args, random_timestamp=random_timestamp,
+                current_timestamp=current_timestamp, **kwargs
+            )
+
+        utils.patch_session_get(monkeypatch, mock_response_get)
+
+        import homework
+
+        monkeypatch.setattr(homework, 'PRACTICUM_TOKEN', 'sometoken')
+        homework.get_api_answer(current_timestamp)
+        assert sent_headers[-1]['Authorization'] == 'OAuth sometoken', (
+            'Проверьте, что заголовок Authorization собирается из '
+            '`PRACTICUM_TOKEN`, который проверяет `check_tokens`'
+        )
+
+    def test_check_response_no_current_date(self, monkeypatch,
+                                            random_timestamp,
+                                            current_timestamp, api_url):
+        def mock_response_get(*args, **kwargs):
+            response = MockResponseGET(
+                *args, random_timestamp=random_timestamp,
+                current_timestamp=current_timestamp,
+                **kwargs
+            )
+
+            def valid_response_json():
+                data = {
+                    "homeworks": [
+                        {
+                            'homework_name': 'hw123',
+                            'status': 'approved'
+                        }
+                    ]
+                }
+                return data
+
+            response.json = valid_response_json
+            return response
+
+        utils.patch_session_get(monkeypatch, mock_response_get)
+
+        import homework
+
+        func_name = 'check_response'
+        response = homework.get_api_answer(current_timestamp)
+        homeworks = homework.check_response(response)
+        assert homeworks == response['homeworks'], (
+            f'Убедитесь, что функция `{func_name}` принимает ответ API '
+            'без ключа `current_date`'
+        )
+
+        response['current_date'] = 'not a timestamp'
+        try:
+            homework.check_response(response)
+        except homework.TheAnswerListError:
+            pass
+        else:
+            assert False, (
+                f'Убедитесь, что функция `{func_name}` проверяет тип '
+                '`current_date`, если ключ есть в ответе API'
+            )
+
+    def test_send_message_skips_duplicates(self, monkeypatch,
+                                           random_timestamp):
+        import homework
+
+        now = [1000.0]
+        monkeypatch.setattr(homework.time, 'monotonic', lambda: now[0])
+        monkeypatch.setattr(homework, '_last_sent', {})
+        monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', 12345)
+        bot = MockTelegramBot(token='1234:abcdefg',
+                              random_timestamp=random_timestamp)
+
+        func_name = 'send_message'
+        homework.send_message(bot, 'a').result()
+        assert homework.send_message(bot, 'a') is None, (
+            f'Убедитесь, что функция `{func_name}` не отправляет '
+            'повторно то же сообщение в течение `DEDUP_TTL`'
+        )
+
+        now[0] += homework.DEDUP_TTL
+        assert homework.send_message(bot, 'b') is not None
+        assert len(homework._last_sent) == 1, (
+            f'Убедитесь, что функция `{func_name}` удаляет '
+            'устаревшие записи о отправленных сообщениях'
+        )
+        assert homework.send_message(bot, 'a') is not None, (
+            f'Убедитесь, что функция `{func_name}` снова отправляет '
+            'сообщение после истечения `DEDUP_TTL`'
+        )
+
+    def test_send_message_retries_after_failure(self, monkeypatch,
+                                                random_timestamp):
+        import homework
+
+        monkeypatch.setattr(homework, '_last_sent', {})
+        monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', 12345)
+        bot = MockTelegramBot(token='1234:abcdefg',
+                              random_timestamp=random_timestamp)
+
+        func_name = 'send_message'
+        full_queue = homework.threading.BoundedSemaphore(1)
+        full_queue.acquire()
+        with monkeypatch.context() as queue_patch:
+            queue_patch.setattr(homework, '_TG_PENDING', full_queue)
+            assert homework.send_message(bot, 'b') is None
+        future = homework.send_message(bot, 'b')
+        assert future is not None, (
+            f'Убедитесь, что функция `{func_name}` не считает '
+            'отправленным сообщение, пропущенное из-за полной очереди'
+        )
+        future.result()
+
+        failing_bot = MockFailingTelegramBot(
+            token='1234:abcdefg', random_timestamp=random_timestamp
+        )
+        homework.send_message(failing_bot, 'c').result()
+        assert homework.send_message(bot, 'c') is not None, (
+            f'Убедитесь, что функция `{func_name}` не считает '
+            'отправленным сообщение, которое Telegram не принял'
+        )
+
+    def test_state_round_trip(self, monkeypatch, tmp_path, random_timestamp):
+        import homework
+
+        monkeypatch.setattr(homework, 'STATE_FILE',
+                            str(tmp_path / 'state.json'))
+
+        func_name = 'load_state'
+        assert homework.load_state() == {}, (
+            f'Убедитесь, что функция `{func_name}` возвращает пустой '
+            'словарь, если файла состояния нет'
+        )
+        homework.save_state(random_timestamp, 'approved')
+        assert homework.load_state() == {
+            'ts': random_timestamp, 'status': 'approved'
+        }, (
+            f'Убедитесь, что функция `{func_name}` читает то, '
+            'что записала `save_state`'
+        )
+
+    def test_load_state_invalid(self, monkeypatch, tmp_path):
+        import homework
+
+        state_file = tmp_path / 'state.json'
+        monkeypatch.setattr(homework, 'STATE_FILE', str(state_file))
+
+        func_name = 'load_state'
+        invalid_states = {
+            b'{"ts": 1000198000': {},
+            b'[1000198000, "approved"]': {},
+            b'{"ts": "abc", "status": "approved"}': {'status': 'approved'},
+            b'{"ts": 1000198000.5, "status": "unknown"}': {},
+            b'{"ts": 1000198000, "status": null}': {'ts': 1000198000},
+        }
+        for content, expected in invalid_states.items():
+            state_file.write_bytes(content)
+            assert homework.load_state() == expected, (
+                f'Убедитесь, что функция `{func_name}` отбрасывает '
+                f'повреждённые или неверные значения: {content!r}'
+            )
+
+    def test_get_api_answer_invalid_json(self, monkeypatch, random_timestamp,
+                                         current_timestamp, api_url):
+        def mock_response_get(*args, **kwargs):
+            return MockInvalidJSONResponseGET(
+                *args, random_timestamp=random_timestamp,
+                current_timestamp=current_timestamp, **kwargs
+            )
+
+        utils.patch_session_get(monkeypatch, mock_response_get)
+
+        import homework
+
+        func_name = 'get_api_answer'
+        try:
+            homework.get_api_answer(current_timestamp)
+        except homework.orjson.JSONDecodeError as error:
+            assert str(error).count('(char ') == 1, (
+                f'Убедитесь, что функция `{func_name}` указывает позицию '
+                f'ошибки в сообщении один раз: {error}'
+            )
+        else:
+            assert False, (
+                f'Убедитесь, что функция `{func_name}` выбрасывает ошибку '
+                'при некорректном JSON в ответе API'
+            )
+
+    def test_get_api_answer_too_large(self, monkeypatch, random_timestamp,
+                                      current_timestamp, api_url):
+        import homework
+
+        def mock_declared_size_get(*args, **kwargs):
+            response = MockResponseGET(
+                *args, random_timestamp=random_timestamp,
+                current_timestamp=current_timestamp, **kwargs
+            )
+            response.headers['Content-Length'] = str(
+                homework.MAX_RESPONSE_SIZE
+            )
+            return response
+
+        func_name = 'get_api_answer'
+        utils.patch_session_get(monkeypatch, mock_declared_size_get)
+        try:
+            homework.get_api_answer(current_timestamp)
+        except homework.TheAnswerTooLargeError:
+            pass
+        else:
+            assert False, (
+                f'Убедитесь, что функция `{func_name}` отклоняет ответ '
+                'по заголовку Content-Length, не читая тело'
+            )
+
+        large_responses = []
+
+        def mock_large_body_get(*args, **kwargs):
+            response = MockResponseGET(
+                *args, random_timestamp=random_timestamp,
+                current_timestamp=current_timestamp, **kwargs
+            )
+
+            def large_response_json():
+                return {
+                    "homeworks": [],
+                    "current_date": random_timestamp,
+                    "padding": 'x' * homework.MAX_RESPONSE_SIZE * 2,
+                }
+
+            response.json = large_response_json
+            large_responses.append(response)
+            return response
+
+        utils.patch_session_get(monkeypatch, mock_large_body_get)
+        try:
+            homework.get_api_answer(current_timestamp)
+        except homework.TheAnswerTooLargeError:
+            pass
+        else:
+            assert False, (
+                f'Убедитесь, что функция `{func_name}` отклоняет слишком '
+                'большой ответ без заголовка Content-Length'
+            )
+        bytes_read = large_responses[-1].chunks_read * homework.READ_CHUNK_SIZE
+        assert bytes_read < homework.MAX_RESPONSE_SIZE + (
+            homework.READ_CHUNK_SIZE
+        ), (
+            f'Убедитесь, что функция `{func_name}` прекращает чтение тела '
+            'ответа, как только превышен `MAX_RESPONSE_SIZE`'
+        )
+
+    def test_get_retry_delay(self, monkeypatch):
+        import homework
+
+        func_name = 'get_retry_delay'
+        utils.check_function(homework, func_name, 1)
+        for fail_count in range(15):
+            base = min(homework.RETRY_TIME,
+                       homework.BASE_DELAY * 2 ** fail_count)
+            delay = homework.get_retry_delay(fail_count)
+            assert base <= delay <= base * 1.5, (
+                f'Убедитесь, что функция `{func_name}` возвращает '
+                'экспоненциальную задержку с джиттером до 50%'
+            )
+
+        monkeypatch.setattr(homework.random, 'uniform', lambda a, b: b)
+        assert homework.get_retry_delay(20) == homework.RETRY_TIME * 1.5, (
+            f'Убедитесь, что функция `{func_name}` ограничивает '
+            'задержку значением `RETRY_TIME`'
+        )
+        monkeypatch.setattr(homework.random, 'uniform', lambda a, b: a)
+        assert homework.get_retry_delay(1) == homework.BASE_DELAY * 2
+
+    def test_get_poll_delay(self):
+        import homework
+
+        func_name = 'get_poll_delay'
+        utils.check_function(homework, func_name, 1)
+        delays = [homework.get_poll_delay(polls) for polls in range(6)]
+        assert delays[0] == homework.POLL_BASE_DELAY, (
+            f'Убедитесь, что функция `{func_name}` начинает опрос '
+            'с `POLL_BASE_DELAY`'
+        )
+        assert delays == sorted(delays), (
+            f'Убедитесь, что интервал `{func_name}` не уменьшается'
+        )
+        assert homework.get_poll_delay(20) == homework.RETRY_TIME, (
+            f'Убедитесь, что функция `{func_name}` ограничивает '
+            'интервал значением `RETRY_TIME`'
+        )
+
+    def test_main_resets_poll_delay_on_status_change(self, monkeypatch,
+                                                     tmp_path,
+                                                     random_timestamp):
+        def mock_telegram_bot(*args, **kwargs):
+            return MockTelegramBot(*args, random_timestamp=random_timestamp,
+                                   **kwargs)
+
+        monkeypatch.setattr(telegram, 'Bot', mock_telegram_bot)
+
+        import homework
+
+        batches = [
+            ['reviewing'],
+            ['reviewing'],
+            ['approved'],
+            ['approved'],
+            ['rejected', 'approved'],
+            ['approved'],
+        ]
+        responses = iter(
+            {
+                'homeworks': [
+                    {'homework_name': f'hw{number}', 'status': status}
+                    for number, status in enumerate(batch)
+                ],
+                'current_date': random_timestamp,
+            }
+            for batch in batches
+        )
+        delays = []
+
+        def mock_wait(delay):
+            delays.append(delay)
+            if len(delays) == len(batches):
+                homework._STOP.set()
+
+        monkeypatch.setattr(homework, 'check_tokens', lambda: True)
+        monkeypatch.setattr(homework, 'TELEGRAM_CHAT_ID', 12345)
+        monkeypatch.setattr(homework, 'STATE_FILE',
+                            str(tmp_path / 'state.json'))
+        monkeypatch.setattr(homework, '_last_sent', {})
+        monkeypatch.setattr(homework.signal, 'signal', lambda *args: None)
+        monkeypatch.setattr(homework, 'get_api_answer',
+                            lambda timestamp: next(responses))
+        monkeypatch.setattr(homework._STOP, 'wait', mock_wait)
+        try:
+            homework.main()
+        finally:
+            homework._STOP.clear()
+
+        base = homework.POLL_BASE_DELAY
+        assert delays == [base, base * 2] * 3, (
+            'Убедитесь, что после смены статуса интервал опроса '
+            'снова начинается с `POLL_BASE_DELAY`'
+        )
+
+    def test_key_errors_str_without_quotes(self):
+        import homework
+
+        for func_name, data in (
+            ('check_response', {}),
+            ('parse_status', {'homework_name': 'hw123', 'status': 'unknown'}),
+        ):
+            try:
+                getattr(homework, func_name)(data)
+            except KeyError as error:
+                assert not str(error).startswith("'"), (
+                    f'Убедитесь, что ошибка функции `{func_name}` '
+                    f'выводится без кавычек: {error}'
+                )
+            else:
+                assert False, (
+                    f'Убедитесь, что функция `{func_name}` выбрасывает '
+                    'ошибку при некорректных данных'
+                )
@@ -37,3 +37,17 @@ def check_default_var_exists(scope: ModuleType, var_name: str) -> None:
         f'{var_name} должна быть переменной, а не функцией.'
     )
 
+
+def patch_session_get(monkeypatch, mock_get) -> None:
+    """
+    Replaces requests.Session.get with a mock, dropping the session argument.
+    :param monkeypatch: pytest monkeypatch fixture
+    :param mock_get: Callable accepting the same arguments as requests.get
+    :return: None
+    """
+    import requests
+
+    def session_get(session, *args, **kwargs):
+        return mock_get(*args, **kwargs)
+
+    monkeypatch.setattr(requests.Session, 'get', session_get)